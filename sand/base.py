@@ -1,19 +1,39 @@
 from datetime import datetime, date, time
 from pandas import DataFrame
-from functools import reduce
-from typing import Literal
+from functools import cache, lru_cache
+from typing import BinaryIO, Callable, Literal
 from pathlib import Path
+from io import BytesIO
+from urllib.parse import urljoin
+from importlib.metadata import version, PackageNotFoundError
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 from sand.constraint import Time, Name, GeoType
 from sand.results import Collection, SandQuery, SandProduct
-from sand.utils import end_of_day
+from sand.utils import end_of_day, write_atomic
 from core.table import read_csv
 from core.tools import only
+from core.geo.product_name import get_pattern, get_level
 from core import log
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 import requests
+import hashlib
+import json
 import ssl
 
+try:
+    import truststore
+except ImportError:
+    truststore = None
+
+try:
+    __version__ = version('sand')
+except PackageNotFoundError:
+    __version__ = 'dev'
+
 
 class BaseDownload:
     """
@@ -29,8 +49,24 @@ class BaseDownload:
         available_collection (list): List of available collections from the provider
         api_collection (str): Name of the collection in provider's API format
         name_contains (list): List of naming constraints for products
+        cache_dir (Path): Directory where query responses are kept for revalidation,
+            disabled if None
+        cache_ttl (float): Number of seconds during which a cached response is 
+            reused without any request, responses are always revalidated if None
+        pool_connections (int): Number of hosts whose connections are kept alive
+        pool_maxsize (int): Number of connections kept alive per host
+        max_retries (Retry): Retry policy for failed connections and transient 
+            server errors, the last response is returned to be checked by 
+            raise_api_error
     """
     
+    cache_dir: Path|None = None
+    cache_ttl: float|None = None
+    pool_connections: int = 4
+    pool_maxsize: int = 20
+    max_retries = Retry(total=3, backoff_factor=0.3, raise_on_status=False,
+                        status_forcelist=[429, 500, 502, 503, 504])
+    
     # Main functions to implement for each provider
     
     def _login(self) -> None:
@@ -145,8 +181,11 @@ class BaseDownload:
         products, 
         dir: Path|str, 
         if_exists: Literal['skip','overwrite','backup','error'] = "skip",
-        parallelized: bool = False
-    ) -> list[Path]:
+        parallelized: bool|None = None,
+        *,
+        max_workers: int = 1,
+        return_exceptions: bool = False
+    ) -> list[Path|Exception]:
         """
         Download all products from API server resulting from a query.
 
@@ -157,28 +196,70 @@ class BaseDownload:
                 - 'skip': Skip download if file exists (default)
                 - 'overwrite': Replace existing file
                 - 'raise': Raise an error if file exists
-            parallelized (bool, optional): If True, downloads products in parallel
-                using multiple threads. Default is False.
+            parallelized (bool, optional): Deprecated, use max_workers instead. 
+                If True, downloads 8 products at the same time.
+            max_workers (int, optional): Number of products downloaded at the 
+                same time, sharing the connections of the session. Keep it low 
+                to respect the rate limits of the provider. Default is 1, 
+                products are downloaded one after the other.
+            return_exceptions (bool, optional): If True, a failed download does 
+                not stop the others and its exception is returned in place of 
+                the path of the product. Otherwise the first error is raised.
 
         Returns:
-            list[Path]: List of paths to downloaded product files
-        """
-        if parallelized:
-            
-            from multiprocessing import Pool
-            from functools import partial
-            
-            workers = min(self.nb_worker, len(products))
-            process = partial(self.download, dir=dir, if_exists=if_exists)
-            with Pool(workers) as pool:
-                tmp = pool.map(process, [p[1] for p in products.iterrows()])
-                # tmp = pool.map(process, products)
-                return tmp
-            
-        out = []
-        for product in products: 
-            out.append(self.download(product, dir, if_exists))
-        return out 
+            list[Path|Exception]: List of paths to downloaded product files
+        """
+        max_workers = _parallelized_workers(parallelized, max_workers)
+        process = lambda p: self.download(p, dir, if_exists)
+        return self._map_threads(process, products, max_workers, 'downloading', 
+                                 return_exceptions)
+    
+    def quicklook_all(
+        self, 
+        products, 
+        dir: Path|str, 
+        max_workers: int = 16,
+        return_exceptions: bool = False
+    ) -> list[Path|Exception]:
+        """
+        Download the quicklooks of all products resulting from a query.
+        
+        Args:
+            products (list[dict]): List of product metadata from query results
+            dir (Path|str): Directory where to save quicklooks
+            max_workers (int, optional): Number of quicklooks requested at the 
+                same time. Default is 16.
+            return_exceptions (bool, optional): If True, errors are returned in 
+                place of the quicklooks instead of being raised.
+        
+        Returns:
+            list[Path|Exception]: List of paths to downloaded quicklooks
+        """
+        process = lambda p: self.quicklook(p, dir)
+        return self._map_threads(process, products, max_workers, 'quicklooks', 
+                                 return_exceptions)
+    
+    def metadata_all(
+        self, 
+        products, 
+        max_workers: int = 16, 
+        return_exceptions: bool = False
+    ) -> list[dict|Exception]:
+        """
+        Retrieve the metadata of all products resulting from a query.
+        
+        Args:
+            products (list[dict]): List of product metadata from query results
+            max_workers (int, optional): Number of metadata requested at the 
+                same time. Default is 16.
+            return_exceptions (bool, optional): If True, errors are returned in 
+                place of the metadata instead of being raised.
+        
+        Returns:
+            list[dict|Exception]: Metadata of each product, in the order of products
+        """
+        return self._map_threads(self.metadata, products, max_workers, 'metadata', 
+                                 return_exceptions)
     
     def get_available_collection(self) -> DataFrame:
         """
@@ -189,8 +270,7 @@ class BaseDownload:
             self._load_provider_properties()
         
         # Join with global information contained
-        current_dir = Path(__file__).parent
-        sensor = read_csv(current_dir/'sensors.csv')
+        sensor = _read_table('sensors.csv')
         return Collection(self.available_collection , sensor)
     
     # Private functions 
@@ -201,7 +281,7 @@ class BaseDownload:
         """
         provider_file = Path(__file__).parent/'collections'/f'{self.provider}.csv'
         log.check(provider_file.exists(), 'Provider properties file is missing')
-        provider_prop = read_csv(provider_file)
+        provider_prop = _read_table(f'collections/{self.provider}.csv')
         self.available_collection = list(provider_prop['SAND_name'])
         return provider_prop
         
@@ -209,14 +289,156 @@ class BaseDownload:
         """
         Retrieve properties for a specific SAND collection
         """
-        props = self._load_provider_properties()
-        self._get_collec_properties(collection, level, props)
-        self.api_collection = self._retrieve_api_collec()
-        return self._set_name_constraint()
+        # Properties are resolved once per collection and level
+        cache = self.__dict__.setdefault('_collection_props', {})
+        if (collection, level) not in cache:
+            props = self._load_provider_properties()
+            self._get_collec_properties(collection, level, props)
+            cache[(collection, level)] = (
+                self.sand_props, self._retrieve_api_collec(), self._set_name_constraint()
+            )
+        
+        self.sand_props, api_collection, name_constraint = cache[(collection, level)]
+        self.api_collection = list(api_collection)
+        return list(name_constraint)
+    
+    def _map_threads(self, func, products, max_workers: int, desc: str, 
+                     return_exceptions: bool = False, 
+                     executor: Executor|None = None) -> list:
+        """
+        Apply func on each product using a pool of threads sharing the session,
+        results are returned in the order of products. The first error is 
+        raised, unless return_exceptions is True: failures then do not stop the
+        others and their exception is returned in place of the result. Threads
+        of executor are used if it is given, it is not shut down afterwards.
+        """
+        def _apply(product):
+            try:
+                return func(product)
+            except Exception as e:
+                name = getattr(product, 'product_id', product)
+                log.warning(f'Product {name} failed ({desc}): {e}')
+                return e
+        
+        apply = _apply if return_exceptions else func
+        products = list(products)
+        if executor is None and (max_workers <= 1 or len(products) <= 1):
+            return [apply(p) for p in products]
+        
+        # Log in before dispatching so that threads share the same session
+        self._login()
+        if executor is not None:
+            return list(log.pbar(executor.map(apply, products), desc))
+        
+        # More workers than pooled connections would open and discard 
+        # connections instead of reusing them
+        workers = min(max_workers, len(products), self.pool_maxsize)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(log.pbar(pool.map(apply, products), desc))
     
     def _set_session(self): 
         self.session = requests.Session()
         self.ssl_ctx = get_ssl_context()
+        
+        # Ask for compressed responses, with every encoding urllib3 can decode 
+        # (brotli and zstd when installed), and identify the client to the servers
+        self.session.headers.update({
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'User-Agent': f'SAND/{__version__} {self.session.headers["User-Agent"]}',
+        })
+        
+        # Keep connections alive between calls and retry transient server errors.
+        # Verify certificates with the OS trust store if available, otherwise 
+        # keep the certifi bundle used by requests
+        ctx = self.ssl_ctx if truststore is not None else None
+        adapter = SSLContextAdapter(ssl_context=ctx, 
+                                    pool_connections=self.pool_connections, 
+                                    pool_maxsize=self.pool_maxsize, 
+                                    max_retries=self.max_retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def _get_redirected(self, url: str, headers: dict|None = None, 
+                        max_redirects: int = 5) -> requests.Response:
+        """
+        Send a streamed GET request and follow the first redirections manually,
+        as requests drops the Authorization header when redirected to another 
+        host while the providers expect it on their download servers. The 
+        response is streamed, callers raising on its status must close it.
+        """
+        response = self.session.get(url, headers=headers, allow_redirects=False, 
+                                    stream=True)
+        niter = 0
+        while response.status_code in (301, 302, 303, 307) and niter < max_redirects:
+            log.debug(f'Download content [Try {niter+1}/{max_redirects}]')
+            if 'Location' not in response.headers:
+                response.close()
+                raise ValueError(f'status code : [{response.status_code}]')
+            url = urljoin(response.url, response.headers['Location'])
+            response.close()
+            response = self.session.get(url, headers=headers, allow_redirects=True, 
+                                        stream=True)
+            niter += 1
+        return response
+    
+    def _cached_request(self, method: str, url: str, 
+                        validate: Callable[[bytes], bool]|None = None, 
+                        **kwargs) -> BinaryIO:
+        """
+        Send a request and return the response body as a binary file object, 
+        streamed from the socket when no cache is used. If ``cache_dir`` is set, 
+        the stored response is revalidated with its ETag or Last-Modified value 
+        and reused when the server replies it is unchanged (HTTP 304). If 
+        ``cache_ttl`` is also set, a stored response younger than it is reused 
+        without contacting the server. Responses for which ``validate`` returns 
+        False (e.g. error payloads sent with a 2xx status) are never stored.
+        """
+        if self.cache_dir is None:
+            response = self.session.request(method, url, stream=True, **kwargs)
+            raise_api_error(response)
+            response.raw.decode_content = True
+            return response.raw
+        
+        # Identify request by its method, url and payload
+        payload = json.dumps(kwargs.get('json'), sort_keys=True, default=str)
+        key = hashlib.sha1(f'{method} {url} {payload}'.encode()).hexdigest()
+        body = Path(self.cache_dir)/f'{key}.json'
+        tags = Path(self.cache_dir)/f'{key}.etag'
+        
+        # Reuse a recent response without any request
+        if self.cache_ttl and body.exists():
+            age = datetime.now().timestamp() - body.stat().st_mtime
+            if age < self.cache_ttl:
+                log.debug(f'Reuse cached response {body}')
+                return open(body, 'rb')
+        
+        # Ask the server to revalidate the stored response
+        headers = dict(kwargs.pop('headers', None) or {})
+        if body.exists() and tags.exists():
+            validators = json.loads(tags.read_text())
+            if 'ETag' in validators:
+                headers['If-None-Match'] = validators['ETag']
+            if 'Last-Modified' in validators:
+                headers['If-Modified-Since'] = validators['Last-Modified']
+        
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 304:
+            log.debug(f'Server response unchanged, reuse {body}')
+            return open(body, 'rb')
+        raise_api_error(response)
+        
+        # Store response if the server provides a way to revalidate it or if 
+        # it can be reused for some time
+        validators = {k: response.headers[k] for k in ('ETag', 'Last-Modified') 
+                      if k in response.headers}
+        if validate is not None and not validate(response.content):
+            return BytesIO(response.content)
+        if validators or self.cache_ttl:
+            Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+            write_atomic(body, response.content)
+        if validators:
+            write_atomic(tags, json.dumps(validators).encode())
+        return BytesIO(response.content)
     
     def _get_collec_properties(self, collection, level, properties):
         """
@@ -252,9 +474,6 @@ class BaseDownload:
         to_add = only(self.sand_props['contains'])
         return [] if str(to_add) == 'nan' else to_add.split(' ')
     
-    def _check_name(self, name, check_funcs) -> bool:
-        return all(c[0](name, c[1]) for c in check_funcs)
-    
     def _format_time(self, collection: str, t: Time|None) -> Time|None:
         """
         Function to check and format main arguments of query method
@@ -267,8 +486,7 @@ class BaseDownload:
             return t
         
         # Open reference file
-        ref_file = Path(__file__).parent/'sensors.csv'
-        ref = read_csv(ref_file)
+        ref = _read_table('sensors.csv')
         ref = ref[ref['Name'] == collection]
         
         # Check format
@@ -284,9 +502,38 @@ class BaseDownload:
         
         return t
     
-    def __del__(self):
+    def close(self) -> None:
+        """
+        Close the HTTP session and release its pooled connections
+        """
         if hasattr(self, 'session'):
             self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __del__(self):
+        self.close()
+
+@lru_cache(maxsize=256)
+def get_product_collection(product_id: str) -> tuple[str, int]:
+    """
+    Return the SAND collection name and the level of a product from its name,
+    parsed once per product name
+    """
+    p = get_pattern(product_id)
+    return p['Name'], get_level(product_id, p)
+
+@cache
+def _read_table(filename: str) -> DataFrame:
+    """
+    Read a CSV table shipped with the package, parsed only once per process.
+    The returned table is shared and must not be modified in place.
+    """
+    return read_csv(Path(__file__).parent/filename)
 
 def raise_api_error(response: requests.Response) -> int:
     """
@@ -299,46 +546,65 @@ def raise_api_error(response: requests.Response) -> int:
         int: Status code if response is successful (status < 300)
     """
     log.check(hasattr(response,'status_code'), 'No status code in response', e=Exception)
-    ref = read_csv(Path(__file__).parent/'html_status_code.csv')
-    
-    msg = '[{}] {}'
     status = response.status_code
+    if status <= 300:
+        return status
+    
+    # Describe the error from the reference table, or from the server reason
+    # for status codes missing in it
+    ref = _read_table('html_status_code.csv')
     line = ref[ref['value']==status]
-    if status > 300:
-        log.error(msg.format(only(line['tag']), only(line['explain']), e=RequestsError))
-    return status
+    if len(line) == 1:
+        msg = f"[{only(line['tag'])}] {only(line['explain'])}"
+    else:
+        msg = f"[{status}] {getattr(response, 'reason', '')}"
+    
+    # Release the connection of streamed responses before raising
+    if getattr(response, 'raw', None) is not None:
+        response.close()
+    log.error(msg, e=RequestsError)
 
-def check_too_many_matches(response: dict, 
-                           returned_tag: str|list[str], 
-                           hit_tag: str|list[str]) -> None:
+def _parallelized_workers(parallelized: bool|None, max_workers: int) -> int:
     """
-    Check if an API query returned more matches than it can return in one response.
-    
-    Args:
-        response (dict): API response containing result counts
-        returned_tag (str|list[str]): Path to the number of returned results in response
-        hit_tag (str|list[str]): Path to the total number of matches in response
+    Convert the deprecated parallelized argument of download_all to a number 
+    of workers, max_workers is returned unchanged if it is not given
     """
-    returned = reduce(lambda x,k: x[k], returned_tag, response) 
-    matches = reduce(lambda x,k: x[k], hit_tag, response)
-    
-    if returned > matches:
-        log.warning(
-            f"The query returned too many matches ({matches}) "
-            f"and exceeded the limit ({returned}) set by the provider."
-        )
+    if parallelized is None:
+        return max_workers
+    log.warning('The parallelized argument of download_all is deprecated, '
+                'use max_workers instead')
+    return (max_workers if max_workers > 1 else 8) if parallelized else 1
 
 def get_ssl_context() -> ssl.SSLContext:
     """
-    Returns an SSL context based on ``ssl_verify`` argument.
+    Returns an SSL context verifying server certificates, based on the 
+    operating system trust store when truststore is installed.
 
-    :param ssl_verify: :attr:`~eodag.config.PluginConfig.ssl_verify` parameter
     :returns: An SSL context object.
     """
-    ctx = ssl.create_default_context()
+    if truststore is not None:
+        ctx = truststore.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    else:
+        ctx = ssl.create_default_context()
     ctx.check_hostname = True
     ctx.verify_mode = ssl.CERT_REQUIRED
     return ctx
 
 
+class SSLContextAdapter(HTTPAdapter):
+    """
+    HTTP adapter creating its connections with a given SSL context, so that the
+    context is built once per session instead of once per connection pool.
+    """
+    
+    def __init__(self, ssl_context: ssl.SSLContext|None = None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs['ssl_context'] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+
 class RequestsError(Exception): pass
\ No newline at end of file
@@ -3,9 +3,11 @@ from pathlib import Path
 from typing import Literal
 
 from sand.constraint import Time, Geo, GeoType, Name
-from sand.base import BaseDownload, raise_api_error, check_too_many_matches
+from sand.base import BaseDownload, raise_api_error
 from sand.results import SandQuery, SandProduct
-from sand.utils import write, get_compression_suffix
+from sand.utils import (
+    write, get_compression_suffix, iter_json_items, isoformat_seconds, load_json
+)
 
 from core import log
 from core.network.auth import get_auth
@@ -18,22 +20,29 @@ from core.files.uncompress import uncompress
 class DownloadCNES(BaseDownload):
     """
     Python interface to the CNES Geodes Data Center (https://geodes-portal.cnes.fr/)
+    
+    Args:
+        cache_dir (Path|str, optional): Directory where search responses are stored
+            and revalidated with the server before being reused.
     """
     
     provider = 'cnes'
     safe_product = ['S1A','S2A','S2B']
     
-    def __init__(self):
+    def __init__(self, cache_dir: Path|str|None = None):
         super().__init__()
+        self.cache_dir = Path(cache_dir) if cache_dir else None
 
     def _login(self):
         # Check if session is already set and set it up if not 
         if not hasattr(self, "session"):
             self._set_session()
         
+        # API key is read once and attached to every request of the session
         if not hasattr(self, 'tokens'):  
             auth = get_auth("geodes.cnes.fr")     
             self.tokens = auth['password']
+            self.session.headers.update({"X-API-Key": self.tokens})
             log.debug('Log to API (https://geodes-portal.cnes.fr/)')
 
     def query(
@@ -71,9 +80,9 @@ class DownloadCNES(BaseDownload):
         
         # Time constraint
         if time and time.start:
-            query['start_datetime'] = {'gte':time.start.isoformat()[:19]+'Z'}
+            query['start_datetime'] = {'gte':isoformat_seconds(time.start)+'Z'}
         if time and time.end:
-            query['end_datetime'] = {'lte':time.end.isoformat()[:19]+'Z'}
+            query['end_datetime'] = {'lte':isoformat_seconds(time.end)+'Z'}
         
         # Spatial constraint
         if isinstance(geo, Geo.Point|Geo.Polygon): 
@@ -85,25 +94,36 @@ class DownloadCNES(BaseDownload):
         if cloudcover_thres: 
             query['eo:cloud_cover'] = {"lte":cloudcover_thres}
         
+        # Let the server filter on the most selective substring of the name, 
+        # every constraint is still checked on the returned features
+        substrings = [*name.contains, *(s for s in (name.startswith, name.endswith) 
+                                        if isinstance(s, str))]
+        if any(substrings):
+            query['identifier'] = {'contains': max(substrings, key=len)}
+        
         data['query'] = query
-        self.session.headers.update({"X-API-Key": self.tokens})
-        self.session.headers.update({"Content-type": "application/json"})
-        response = self.session.post(server_url, json=data, verify=True)
-        raise_api_error(response)
         
-        # Filter products
-        check_too_many_matches(response.json(), ['context','returned'], ['context','matched'])
-        r = response.json()['features']
-        response = [p for p in r if name.apply(p["properties"]['identifier'])]   
-
-        out =  [
-            SandProduct(
-                product_id=d["properties"]["identifier"], index=d["id"],
-                date=d['properties']['start_datetime'],
-                metadata=d
+        # Parse and filter features while they are received
+        match = name.matcher()
+        out, nfeatures = [], 0
+        with self._cached_request('POST', server_url, json=data) as fp:
+            for d in iter_json_items(fp, 'features'):
+                nfeatures += 1
+                props = d['properties']
+                product_id = props['identifier']
+                if not match(product_id):
+                    continue
+                out.append(SandProduct(
+                    product_id=product_id, index=d["id"],
+                    date=props['start_datetime'],
+                    metadata=d
+                ))
+        
+        if nfeatures >= data['limit']:
+            log.warning(
+                f"The query returned too many matches and reached the limit "
+                f"({data['limit']}) set by the provider. Please refine your query."
             )
-            for d in response
-        ]
         
         log.info(f'{len(out)} products has been found')
         return SandQuery(out)
@@ -155,11 +175,10 @@ class DownloadCNES(BaseDownload):
         #     assert desc['Is online'] == 'true', 'This product has been archived.'
         
         # Download compressed file
-        self.session.headers.update({"X-API-Key": self.tokens})
-        response = self.session.get(url['href'], verify=True)
+        response = self.session.get(url['href'], stream=True)
         
         raise_api_error(response)
-        write(response, dl_target)
+        write(response, dl_target, session=self.session)
             
         # Uncompress archive
         if compression_ext:
@@ -185,12 +204,9 @@ class DownloadCNES(BaseDownload):
         
         @filegen(if_exists='skip')
         def _dl(target):
-            self.session.headers.update({"X-API-Key": self.tokens})
-            self.session.headers.update({"Content-type": "application/json"})
-            
-            response = self.session.post(server_url, json=data, verify=False)
+            response = self.session.post(server_url, json=data)
             raise_api_error(response)
-            r = response.json()['features']
+            r = load_json(response.content)['features']
             assert len(r) > 0, f'No product named {product_id}'
             assert len(r) < 2, f'Multiple products found for {product_id}'
             
@@ -237,22 +253,10 @@ class DownloadCNES(BaseDownload):
         server_url = "https://geodes-portal.cnes.fr/api/stac/search"
         data = {'page':1, 'limit':5}
         data['query'] = {'identifier': {'contains':product.product_id}}
-
-        self.session.headers.update({"X-API-Key": self.tokens})
-        self.session.headers.update({"Content-type": "application/json"})
-        response = self.session.post(server_url, json=data, verify=True)
+        response = self.session.post(server_url, json=data)
         raise_api_error(response)
 
-        return response.json()['features'][0]['properties']
-    
-    def _get(self, liste, name, in_key, out_key):
-        """
-        Internal helper to find a value in a list of dictionaries by matching keys
-        """
-        for col in liste:
-            if in_key in col and name in col[in_key]:
-                return col[out_key]
-        log.error(f'{name} has not been found', e=KeyError)
+        return load_json(response.content)['features'][0]['properties']
     
     def _parse_response_description(self, description: str) -> dict:
         outdict = dict()
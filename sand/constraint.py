@@ -1,13 +1,11 @@
-from typing import Literal, List, TypeAlias
+from typing import Callable, Literal, List, TypeAlias
 from datetime import datetime, date
+from functools import lru_cache
+from operator import methodcaller
+from re import compile, escape, error
 from shapely import to_wkt, Polygon
 from core import log
-from sand.utils import (
-    check_name_contains, 
-    check_name_endswith, 
-    check_name_glob, 
-    check_name_startswith
-)
+from sand.utils import check_name_contains, make_glob_checker
 
 
 class Time:
@@ -64,9 +62,7 @@ class Geo:
             """
             Convert the polygon to WKT (Well-Known Text) format.
             """
-            p = self.bounds
-            poly = Polygon.from_bounds(p[1], p[0], p[3], p[2])
-            return to_wkt(poly)
+            return _bounds_to_wkt(tuple(self.bounds))
         
     
     class Point(_Base):
@@ -156,8 +152,8 @@ class Name:
     
     def __init__(self, 
             contains: List[str] = [], 
-            startswith: str = "", 
-            endswith: str = "", 
+            startswith: str|tuple[str, ...] = "", 
+            endswith: str|tuple[str, ...] = "", 
             glob: str = ".*"
         ):
         self.contains = contains
@@ -169,13 +165,57 @@ class Name:
         self.contains += elements
     
     def apply(self, name: str) -> bool:
-        checker = [
-            (check_name_contains, self.contains),
-            (check_name_startswith, self.startswith),
-            (check_name_endswith, self.endswith),
-            (check_name_glob, self.glob),
-        ]
-        return all(f(name, params) for f, params in checker)
+        return self.matcher()(name)
+    
+    def matcher(self) -> Callable[[str], bool]:
+        """
+        Build a predicate checking every constraint on a product name.
+        
+        Only the active constraints are kept and patterns are compiled once, 
+        so the predicate should be built before filtering a list of products 
+        rather than calling `apply` on each of them.
+        """
+        # Cheapest checks first, the first failing one skips the others
+        predicates = []
+        if self.startswith:
+            predicates.append(methodcaller('startswith', self.startswith))
+        if self.endswith:
+            predicates.append(methodcaller('endswith', self.endswith))
+        if self.contains:
+            contains = tuple(self.contains)
+            predicates.append(lambda name: check_name_contains(name, contains))
+        if self.glob != '.*':
+            predicates.append(make_glob_checker(self.glob))
+        
+        if not predicates:
+            return lambda name: True
+        if len(predicates) == 1 and len(self.contains) < 2:
+            return predicates[0]
+        
+        # Several constraints are merged into a single regex evaluated in C
+        try:
+            match = compile(self._pattern()).match
+        except error:
+            return lambda name: all(p(name) for p in predicates)
+        return lambda name: match(name) is not None
+    
+    def _pattern(self) -> str:
+        """
+        Regex made of one lookahead per constraint, to match at the start of names
+        """
+        def _any(values):
+            values = (values,) if isinstance(values, str) else values
+            return '|'.join(escape(v) for v in values)
+        
+        parts = []
+        if self.startswith:
+            parts.append(f'(?=(?:{_any(self.startswith)}))')
+        if self.endswith:
+            parts.append(f'(?=.*(?:{_any(self.endswith)})\\Z)')
+        parts += [f'(?=.*{escape(c)})' for c in self.contains]
+        if self.glob != '.*':
+            parts.append(f'(?=(?:{self.glob})\\Z)')
+        return ''.join(parts)
 
     def __repr__(self) -> str:
         """Return string representation of the Name constraint."""
@@ -194,6 +234,16 @@ def _check_latlon(lat: float = 0, lon: float = 0) -> None:
         log.error(f'Incorrect latitude, got lat={lat}')
 
 
+@lru_cache(maxsize=128)
+def _bounds_to_wkt(bounds: tuple) -> str:
+    """
+    Convert (lat_min, lon_min, lat_max, lon_max) bounds to a WKT polygon, cached
+    as the same area is usually serialized for several queries
+    """
+    poly = Polygon.from_bounds(bounds[1], bounds[0], bounds[3], bounds[2])
+    return to_wkt(poly)
+
+
 def _change_lon_convention(lon, center: Literal[0,180]):
     """
     Change the longitude convention of a geometry between 0-centered and 180-centered
@@ -5,8 +5,10 @@ from typing import Literal
 from pathlib import Path
 import requests
 
-from sand.base import raise_api_error, BaseDownload, RequestsError
-from sand.utils import write, check_name_glob
+from sand.base import (
+    raise_api_error, BaseDownload, RequestsError, get_product_collection
+)
+from sand.utils import write, make_glob_checker, load_json
 from sand.constraint import Time, Geo, GeoType, Name
 from sand.results import SandQuery, SandProduct
 
@@ -14,7 +16,6 @@ from core import log
 from core.files import filegen
 from core.network.auth import get_auth
 from core.files.uncompress import uncompress
-from core.geo.product_name import get_pattern, get_level
 
 
 class DownloadCDSE(BaseDownload):
@@ -51,7 +52,7 @@ class DownloadCDSE(BaseDownload):
             "grant_type": "password",
         }
         url = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
-        r = requests.post(url, data=data)
+        r = self.session.post(url, data=data)
         try:
             r.raise_for_status()
         except Exception:
@@ -101,9 +102,10 @@ class DownloadCDSE(BaseDownload):
         # Concatenate every information into a single object
         log.debug(f"Query OData API")
         params = _Request_params(api_collection, time, geo, name, cloudcover_thres)
-        response = _query_odata(params)
+        response = _query_odata(self.session, params)
 
         # Format list of product
+        match = make_glob_checker(name.glob)
         out = [
             SandProduct(
                 index=d["Id"],
@@ -112,7 +114,7 @@ class DownloadCDSE(BaseDownload):
                 metadata=d,
             )
             for d in response
-            if check_name_glob(d["Name"], name.glob)
+            if match(d["Name"])
         ]
 
         log.info(f"{len(out)} products has been found")
@@ -143,31 +145,25 @@ class DownloadCDSE(BaseDownload):
         # Compression file path
         dl_target = Path(str(target) + compression_ext) if compression_ext else target
 
-        status = False
-        while not status:
-            try:
-                # Initialize session for download
-                self.session.headers.update({"Authorization": f"Bearer {self.tokens}"})
-
-                # Try to request server
-                niter = 0
-                response = self.session.get(url, allow_redirects=False)
-                log.debug(f"Requesting server for {target.name}")
-                while response.status_code in (301, 302, 303, 307) and niter < 5:
-                    log.debug(f"Download content [Try {niter + 1}/5]")
-                    if "Location" not in response.headers:
-                        raise ValueError(f"status code : [{response.status_code}]")
-                    url = response.headers["Location"]
-                    response = self.session.get(url, verify=True, allow_redirects=True)
-                    niter += 1
-                response.raise_for_status()
-                status = True
-
-            except Exception as e:
-                # Refresh session tokens
-                self.session = requests.Session()
-                auth = get_auth("dataspace.copernicus.eu")
-                self._get_tokens(auth)
+        # An expired token is refreshed once, the session is left untouched as
+        # it is shared with the other downloads
+        for attempt in range(2):
+            # Short-lived token is only sent to download servers, rather than
+            # stored in the session shared with catalogue requests
+            headers = {"Authorization": f"Bearer {self.tokens}"}
+            
+            # Try to request server
+            log.debug(f"Requesting server for {target.name}")
+            response = self._get_redirected(url, headers=headers)
+            if response.status_code not in (401, 403) or attempt:
+                break
+            response.close()
+            self._get_tokens(get_auth("dataspace.copernicus.eu"))
+        
+        # Other errors are raised, after releasing the connection
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
 
         # Download compressed file
         write(response, dl_target)
@@ -184,8 +180,7 @@ class DownloadCDSE(BaseDownload):
         self._login()
 
         # Retrieve api collections based on SAND collections
-        p = get_pattern(product_id)
-        collection_sand, level = p["Name"], get_level(product_id, p)
+        collection_sand, level = get_product_collection(product_id)
         self._load_sand_collection_properties(collection_sand, level)
         name = Name(contains=[product_id])
         
@@ -234,7 +229,9 @@ class DownloadCDSE(BaseDownload):
             "https://catalogue.dataspace.copernicus.eu/odata/v1/Products?$filter=Id"
             f" eq '{product.index}'&$expand=Attributes&$expand=Assets"
         )
-        json = requests.get(req).json()
+        response = self.session.get(req)
+        raise_api_error(response)
+        json = load_json(response.content)
 
         assert len(json["value"]) == 1
         return json["value"][0]
@@ -249,8 +246,8 @@ class _Request_params:
     cloudcover_thres: int|None
 
 
-def _query_odata(params: _Request_params):
-    """Query the EOData Finder API"""
+def _query_odata(session: requests.Session, params: _Request_params):
+    """Query the EOData Finder API through the session of the downloader"""
 
     query_lines = [
         f"""https://catalogue.dataspace.copernicus.eu/odata/v1/Products?$filter=Collection/Name eq '{params.collection}' """
@@ -266,14 +263,14 @@ def _query_odata(params: _Request_params):
         )
 
     if params.name and params.name.startswith != "":
-        query_lines.append(f"startswith(Name, '{params.name.startswith}')")
+        query_lines.append(_any_of('startswith', params.name.startswith))
 
     if params.name and len(params.name.contains) != 0:
         for cont in params.name.contains:
             query_lines.append(f"contains(Name, '{cont}')")
 
     if params.name and params.name.endswith != "":
-        query_lines.append(f"endswith(Name, '{params.name.endswith}')")
+        query_lines.append(_any_of('endswith', params.name.endswith))
 
     if params.cloudcover_thres:
         query_lines.append(
@@ -283,14 +280,22 @@ def _query_odata(params: _Request_params):
 
     top = 1000  # maximum value of number of retrieved values
     req = (" and ".join(query_lines)) + f"&$top={top}"
-    response = requests.get(requote_uri(req), verify=True)
+    response = session.get(requote_uri(req))
 
     raise_api_error(response)
-    if len(response.json()["value"]) >= top:
+    products = load_json(response.content)["value"]
+    if len(products) >= top:
         raise RequestsError("The number of matches has reached the API limit on"
         " the maximum number of items returned. This may mean that some hits are"
         " missing. Please refine your query.")
-    return response.json()["value"]
+    return products
+
+
+def _any_of(func: str, values: str|tuple[str, ...]) -> str:
+    """Build an OData filter on the product name accepting any of the values"""
+    if isinstance(values, str):
+        return f"{func}(Name, '{values}')"
+    return "(" + " or ".join(f"{func}(Name, '{v}')" for v in values) + ")"
 
 
 # SHOULD BE DEPRECATED
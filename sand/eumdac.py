@@ -4,17 +4,17 @@ import requests
 from pathlib import Path
 from typing import Literal
 from tempfile import TemporaryDirectory
+from shutil import copyfileobj
 from datetime import datetime
 
 from sand.constraint import Time, Geo, GeoType, Name
-from sand.base import raise_api_error, RequestsError, BaseDownload
+from sand.base import raise_api_error, RequestsError, BaseDownload, get_product_collection
 from sand.results import SandQuery, SandProduct
 from sand.utils import write
 
 from core import log
 from core.table import read_xml
 from core.network.auth import get_auth
-from core.geo.product_name import get_pattern, get_level
 from core.files import filegen, uncompress
 
 
@@ -33,9 +33,8 @@ class DownloadEumDAC(BaseDownload):
         if not hasattr(self, "session"):
             self._set_session()
             
-        auth = get_auth('data.eumetsat.int')
-        
         if not hasattr(self, 'tokens'):
+            auth = get_auth('data.eumetsat.int')
             credentials = (auth['user'], auth['password'])
             self.tokens = eumdac.AccessToken(credentials)
             
@@ -79,6 +78,7 @@ class DownloadEumDAC(BaseDownload):
             name = Name(contains=name_constraint)
         
         product = []
+        match = name.matcher()
         for collec in self.api_collection:
             
             # Query EumDAC API
@@ -95,7 +95,7 @@ class DownloadEumDAC(BaseDownload):
                 continue
             
             # Filter products
-            product += [p for p in prod if name.apply(str(p))]
+            product += [p for p in prod if match(str(p))]
         
         if cloudcover_thres: 
             log.warning("'cloudcover_thres' is not used with eumdac") 
@@ -139,8 +139,7 @@ class DownloadEumDAC(BaseDownload):
         
         # Retrieve api collections based on SAND collections        
         if api_collection is None:
-            p = get_pattern(product_id)
-            collection_sand, level = p['Name'], get_level(product_id, p)
+            collection_sand, level = get_product_collection(product_id)
             self._load_sand_collection_properties(collection_sand, level)
         else:
             self.api_collection = [api_collection]
@@ -175,10 +174,7 @@ class DownloadEumDAC(BaseDownload):
         
         log.debug(f"Downloading {data._id} ...")
         with data.open() as fsrc, open(dl_target, mode='wb') as fdst:
-            while True:
-                chunk = fsrc.read(1024)
-                if not chunk: break
-                fdst.write(chunk)
+            copyfileobj(fsrc, fdst, length=1 << 20)
             
         # Uncompress archive
         if compression_ext:
@@ -196,20 +192,14 @@ class DownloadEumDAC(BaseDownload):
         url = quicklook_url[0]['href']      
         target = Path(dir)/(url.split('/')[-2].split('.')[0] + '.jpeg')
         
-        def _download_qkl(target, url):# Initialize session for download
-            self.session.headers.update({'Authorization': f'Bearer {self.tokens}'})
+        def _download_qkl(target, url):
+            # Token is sent with each request rather than stored in the shared 
+            # session, eumdac renews it when it expires
+            headers = {'Authorization': f'Bearer {self.tokens}'}
 
             # Try to request server
-            niter = 0
-            response = self.session.get(url, allow_redirects=False)
             log.debug(f'Requesting server for {target.name}')
-            while response.status_code in (301, 302, 303, 307) and niter < 5:
-                log.debug(f'Download content [Try {niter+1}/5]')
-                if 'Location' not in response.headers:
-                    raise ValueError(f'status code : [{response.status_code}]')
-                url = response.headers['Location']
-                response = self.session.get(url, verify=True, allow_redirects=True)
-                niter += 1
+            response = self._get_redirected(url, headers=headers)
             raise_api_error(response)
 
             # Download file
@@ -227,10 +217,11 @@ class DownloadEumDAC(BaseDownload):
         
         meta_url = product.metadata.metadata['properties']['links']['alternates']
         req = (meta_url[0]['href'])
-        meta = requests.get(req).text
+        response = self.session.get(req)
+        raise_api_error(response)
+        meta = response.content
 
         assert len(meta) > 0
         with TemporaryDirectory() as tmpdir:
-            with open(Path(tmpdir)/'meta.xml', 'w') as f:
-                f.writelines(meta.split('\n'))
+            (Path(tmpdir)/'meta.xml').write_bytes(meta)
             return read_xml(Path(tmpdir)/'meta.xml')
\ No newline at end of file
@@ -7,11 +7,10 @@ from re import match
 from core import log
 from core.files import filegen
 from core.table import read_xml
-from core.geo.product_name import get_pattern, get_level
 
-from sand.utils import write, drop_extension
+from sand.utils import write, drop_extension, load_json
 from sand.constraint import Time, Geo, GeoType, Name
-from sand.base import BaseDownload, raise_api_error
+from sand.base import BaseDownload, raise_api_error, get_product_collection
 from sand.results import SandQuery, SandProduct
 
 # BASED ON : https://github.com/yannforget/landsatxplore/tree/master/landsatxplore
@@ -92,17 +91,19 @@ class DownloadNASA(BaseDownload):
             data['page_size'] = 1000
             url = 'https://cmr.earthdata.nasa.gov/search/granules'
             url_encode = url + '?' + urlencode(data)
-            response = self.session.post(url_encode, headers=headers, verify=True)
-            if len(response.json()['feed']['entry']) == data['page_size']:
+            response = self.session.post(url_encode, headers=headers)
+            raise_api_error(response)
+            entries = load_json(response.content)['feed']['entry']
+            if len(entries) == data['page_size']:
                 log.warning( 
                     "The number of matches has reached the API limit on the maximum " 
                     "number of items returned. This may mean that some hits are missing. "
                     "Please refine your query."
                 )
-            response = response.json()['feed']['entry']   
             
             # Filter products
-            response = [p for p in response if name.apply(p['title'])]        
+            match = name.matcher()
+            response = [p for p in entries if match(p['title'])]        
             
             for d in response:
                 if 'producer_granule_id' in d: prod_id = d['producer_granule_id'] 
@@ -125,8 +126,7 @@ class DownloadNASA(BaseDownload):
         
         # Retrieve api collections based on SAND collections        
         if api_collection is None:
-            p = get_pattern(product_id)
-            collection_sand, level = p['Name'], get_level(product_id, p)
+            collection_sand, level = get_product_collection(product_id)
             self._load_sand_collection_properties(collection_sand, level)
         else:
             self.api_collection = [api_collection]
@@ -142,8 +142,9 @@ class DownloadNASA(BaseDownload):
                 data['collection_concept_id'] = collec
                 data['producer_granule_id'] = drop_extension(product_id)
                 url_encode = url + '?' + urlencode(data)
-                response = self.session.post(url_encode, headers=headers, verify=True)
-                response = response.json()['feed']['entry']   
+                response = self.session.post(url_encode, headers=headers)
+                raise_api_error(response)
+                response = load_json(response.content)['feed']['entry']
                 if len(response) == 0: continue          
                 
                 dl_url = response[0]['links'][0]['href']
@@ -183,16 +184,8 @@ class DownloadNASA(BaseDownload):
         """
 
         # Try to request server
-        niter = 0
-        response = self.session.get(url, allow_redirects=False)
         log.debug(f'Requesting server for {target.name}')
-        while response.status_code in (301, 302, 303, 307) and niter < 5:
-            log.debug(f'Download content [Try {niter+1}/5]')
-            if 'Location' not in response.headers:
-                raise ValueError(f'status code : [{response.status_code}]')
-            url = response.headers['Location']
-            response = self.session.get(url, verify=True, allow_redirects=True)
-            niter += 1
+        response = self._get_redirected(url)
         raise_api_error(response)
 
         # Download file
@@ -221,12 +214,13 @@ class DownloadNASA(BaseDownload):
         
         links = product.metadata['links']
         req = self._get(links, product.product_id + '.*.xml')
-        meta = self.session.get(req).text
+        response = self.session.get(req)
+        raise_api_error(response)
+        meta = response.content
 
         assert len(meta) > 0
         with TemporaryDirectory() as tmpdir:
-            with open(Path(tmpdir)/'meta.xml', 'w') as f:
-                f.writelines(meta.split('\n'))
+            (Path(tmpdir)/'meta.xml').write_bytes(meta)
             return read_xml(Path(tmpdir)/'meta.xml')
     
     def _get(self, liste, name) -> str:
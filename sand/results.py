@@ -44,7 +44,7 @@ def cache_sandquery(
     )
 
 
-@dataclass
+@dataclass(slots=True)
 class SandProduct:
     """
     Result for a query using any SAND downloader.
@@ -1,56 +1,119 @@
 from pathlib import Path
 from typing import Literal
 from datetime import datetime
-from random import choice
-from string import ascii_lowercase
+from time import monotonic
+from functools import lru_cache
+from secrets import token_hex
+from threading import Lock
+from concurrent.futures import Executor
+from urllib3.util.retry import Retry
 
 from core import log
 from core.network.auth import get_auth
 from core.files import filegen, uncompress
-from core.geo.product_name import get_pattern, get_level
 
 from sand.constraint import Time, Geo, GeoType, Name
-from sand.base import raise_api_error, BaseDownload, check_too_many_matches
+from sand.base import (
+    raise_api_error, BaseDownload, get_product_collection, _parallelized_workers
+)
 from sand.results import SandQuery, SandProduct
-from sand.utils import write
+from sand.utils import write, load_json, iter_json_items
 
 # BASED ON : https://github.com/yannforget/landsatxplore/tree/master/landsatxplore
 
 # M2M API endpoints : https://m2m.cr.usgs.gov/api/docs/reference/#download-search
 class DownloadUSGS(BaseDownload):
+    
+    # Lifetime in seconds of API tokens before requesting a new one, 
+    # tokens are valid for two hours on M2M
+    token_ttl = 3600
+    
+    # Detail of scene metadata returned by queries, 'summary' responses are 
+    # much lighter but lack fields used by metadata and quicklook
+    metadata_type: Literal['full', 'summary'] = 'full'
+    
+    # IDs of the 'Scene Identifier' filter of each dataset, shared by every 
+    # downloader as they do not depend on the user
+    _filter_ids: dict[str, str|None] = {}
+    
+    # Number of byte ranges of large archives downloaded in parallel
+    download_segments = 4
+    
+    # Every M2M call and download redirection goes through the same pool
+    pool_connections = 16
+    pool_maxsize = 32
+    max_retries = Retry(total=5, backoff_factor=0.5, raise_on_status=False,
+                        status_forcelist=[429, 502, 503, 504])
 
-    def __init__(self):
+    def __init__(
+        self, 
+        cache_dir: Path|str|None = None, 
+        cache_ttl: float|None = None
+    ):
         """
         Python interface to the USGS API (https://data.usgs.gov/)
+        
+        Args:
+            cache_dir (Path|str, optional): Directory where search responses 
+                are stored to be reused by identical queries.
+            cache_ttl (float, optional): Number of seconds during which a stored
+                search response is reused. M2M responses cannot be revalidated, 
+                so nothing is stored if None.
         """
         self.provider = 'usgs'
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_ttl = cache_ttl
+        self._login_lock = Lock()
+        self._entity_ids = {}
+        
+        # Label grouping the download requests of this downloader on M2M
+        self._dl_label = datetime.now().strftime("%Y%m%d_%H%M%S")
         
 
     def _login(self):
+        # Threads of download_all must not log in concurrently
+        with self._login_lock:
+            self._login_once()
+    
+    def _login_once(self):
         
         # Check if session is already set and set it up if not 
         if not hasattr(self, "session"):
             self._set_session()
+        
+        # Reuse API token until it is about to expire
+        if hasattr(self, 'API_key') and monotonic() - self._login_ts < self.token_ttl:
+            return
             
-        auth = get_auth("usgs.gov")
+        auth = _cached_auth("usgs.gov")
 
         data = {
             "username": auth['user'],
             "token": auth['password'],
             }
         
-        if not hasattr(self, 'API_key'):
-            try:
-                url = "https://m2m.cr.usgs.gov/api/api/json/stable/login-token"
-                r = self.session.post(url, json=data)
-                r.raise_for_status()
-                assert r.json()['errorCode'] == None
-                self.API_key = {'X-Auth-Token': r.json()['data']}
-            except Exception:
-                raise Exception(
-                    f"Keycloak token creation failed. Reponse from the server was: {r.json()}"
-                    )
-            log.debug(f'Log to API (https://m2m.cr.usgs.gov/)')
+        try:
+            url = "https://m2m.cr.usgs.gov/api/api/json/stable/login-token"
+            r = self.session.post(url, json=data)
+            r.raise_for_status()
+            content = load_json(r.content)
+            assert content['errorCode'] == None
+            self.API_key = {'X-Auth-Token': content['data']}
+        except Exception:
+            raise Exception(
+                f"Keycloak token creation failed. Reponse from the server was: {r.text}"
+                )
+        self._login_ts = monotonic()
+        self.session.headers.update(self.API_key)
+        log.debug(f'Log to API (https://m2m.cr.usgs.gov/)')
+    
+    def _relogin(self):
+        """
+        Drop the current API token and request a new one
+        """
+        with self._login_lock:
+            self.__dict__.pop('API_key', None)
+            self._login_once()
         
 
     def query(
@@ -81,15 +144,16 @@ class DownloadUSGS(BaseDownload):
         else:
             name = Name(contains=name_constraint)
         
-        # Configure scene constraints for request        
-        spatial_filter = {}
-        spatial_filter["filterType"] = "mbr"
-        if isinstance(geo, Geo.Point|Geo.Polygon):
-            bounds = geo.bounds
-            spatial_filter["lowerLeft"]  = {"latitude":bounds[0], 
-                                            "longitude":bounds[1]}
-            spatial_filter["upperRight"] = {"latitude":bounds[2], 
-                                            "longitude":bounds[3]}
+        # Configure scene constraints for request, no spatial filter is sent 
+        # if the area covers the whole globe
+        spatial_filter = None
+        if isinstance(geo, Geo.Point|Geo.Polygon) and not _is_global(geo.bounds):
+            lat_min, lon_min, lat_max, lon_max = geo.bounds
+            spatial_filter = {
+                "filterType": "mbr",
+                "lowerLeft":  {"latitude": lat_min, "longitude": lon_min},
+                "upperRight": {"latitude": lat_max, "longitude": lon_max},
+            }
         
         acquisition_filter = {}
         if time:
@@ -112,31 +176,34 @@ class DownloadUSGS(BaseDownload):
             "datasetName": api_collection,
             "sceneFilter": scene_filter,
             "maxResults": 1000,
-            "metadataType": "full",
+            "metadataType": self.metadata_type,
         }
         
-        # Request API for each dataset
+        # Request API and parse scenes while they are received
         url = "https://m2m.cr.usgs.gov/api/api/json/stable/scene-search"
-        self.session.headers.update(self.API_key)
-        response = self.session.post(url, json=params)
-        if response.json() is not None:
-            check_too_many_matches(response.json(), ['data','recordsReturned'], ['data','totalHits'])
-        raise_api_error(response)
-        r = response.json()
-        if r['data'] is None: log.error(r['errorMessage'], e=Exception)
-        r = r['data']['results']
-        
-        # Filter products
-        response = [p for p in r if name.apply(p['displayId'])]
+        match = name.matcher()
+        out, nresults, header = [], 0, {}
+        with self._cached_request('POST', url, validate=_is_accepted, 
+                                  json=params) as fp:
+            for d in iter_json_items(fp, 'data.results', header):
+                nresults += 1
+                if not match(d['displayId']):
+                    continue
+                out.append(SandProduct(
+                    product_id=d["displayId"], index=d["entityId"],
+                    date=d['temporalCoverage']['startDate'], metadata=d
+                ))
+        
+        # Rejected queries are answered with an error code and null data
+        if header.get('errorCode') is not None or 'data' in header: 
+            log.error(header.get('errorMessage'), e=Exception)
         self.api_collection = api_collection
-
-        out = [
-            SandProduct(
-                product_id=d["displayId"], index=d["entityId"],
-                date=d['temporalCoverage']['startDate'], metadata=d
+        
+        if nresults >= params['maxResults']:
+            log.warning(
+                f"The query returned too many matches and reached the limit "
+                f"({params['maxResults']}) set by the provider. Please refine your query."
             )
-            for d in response
-        ]
         
         log.info(f'{len(out)} products has been found')
         return SandQuery(out)
@@ -152,8 +219,7 @@ class DownloadUSGS(BaseDownload):
         
         # Retrieve api collections based on SAND collections        
         if api_collection is None:
-            p = get_pattern(product_id)
-            collection_sand, level = p['Name'], get_level(product_id, p)
+            collection_sand, level = get_product_collection(product_id)
             self._load_sand_collection_properties(collection_sand, level)
         else:
             self.api_collection = [api_collection]
@@ -162,21 +228,11 @@ class DownloadUSGS(BaseDownload):
         @filegen(if_exists='skip')
         def _dl(target):
             # Retrieve entity_id based on display_id 
-            self.api_collection = self.api_collection[0]
-            entity_id = self._get_entity_id(product_id, self.api_collection)
+            dataset = self.api_collection[0]
+            entity_id = self._get_entity_id(product_id, dataset)
             
             # Retrieve filter ID to use for this dataset
-            url_data = 'https://m2m.cr.usgs.gov/api/api/json/stable/dataset-filters'
-            params = {'datasetName': self.api_collection}
-            self.session.headers.update(self.API_key)
-            r = self.session.get(url_data, json=params)
-            raise_api_error(r)
-            
-            filterid = None
-            for dfilter in r.json()['data']:
-                if 'Scene Identifier' in dfilter['fieldLabel']:
-                    filterid = dfilter['id']
-                    break
+            filterid = self._get_scene_identifier_filter_id(dataset)
             
             # Compose the query 
             scene_filter = {
@@ -189,7 +245,7 @@ class DownloadUSGS(BaseDownload):
             }
             
             params = {
-                "datasetName": self.api_collection,
+                "datasetName": dataset,
                 "sceneFilter": scene_filter,
                 "maxResults": 10,
                 "metadataType": "full",
@@ -199,10 +255,10 @@ class DownloadUSGS(BaseDownload):
             url = "https://m2m.cr.usgs.gov/api/api/json/stable/scene-search"
             response = self.session.get(url, json=params)
             raise_api_error(response)
-            r = response.json()
+            r = load_json(response.content)
             
             if not r['data']['results']:
-                log.error(f'No product found in collection {self.api_collection} '
+                log.error(f'No product found in collection {dataset} '
                         f'for {product_id}')
             
             # Format product to use download function
@@ -211,29 +267,12 @@ class DownloadUSGS(BaseDownload):
                 product_id=product['displayId'], index=product['entityId'],
                 date=product['temporalCoverage']['startDate'], metadata=product
             )
-        
-            # Find product in dataset
-            dl_opt = self._get_dl_options(product)
             
-            # Find available acquisitions
-            for product in dl_opt.json()['data']:
-                
-                # Check if product is correct
-                if not self._check_product(product): 
-                    continue
-                
-                
-                # It is required to wrap it with a try as some products have an inaccurate description 
-                try:
-                    url, ext = self._get_dl_url(product)
-                except ValueError as e:
-                    if 'The selected product is not a downloadable product' in str(e):
-                        continue
-                    else:
-                        raise e
-                
-                self._download(target, url, ext)
-                return 
+            # Download options are requested with the entity ID of the scene found
+            self.api_collection = dataset
+            dl_opt = self._get_dl_options([product]).get(product.index, [])
+            url, ext = self._resolve_download_url(dl_opt)
+            self._download(target, url, ext)
         
         filename = Path(dir)/product_id
         _dl(filename)
@@ -246,16 +285,41 @@ class DownloadUSGS(BaseDownload):
         dir: Path | str, 
         if_exists: Literal['skip','overwrite','backup','error'] = "skip"
     ) -> Path:
+        
+        # Nothing to request if the product has already been downloaded
+        target = Path(dir)/(product.product_id)
+        if if_exists == 'skip' and target.exists():
+            log.info(f'Product has been downloaded at : {target}')
+            return target
 
         self._login()
         
-        target = Path(dir)/(product.product_id)    
-        
         # Find product in dataset
-        dl_opt = self._get_dl_options(product)
-        
+        dl_opt = self._get_dl_options([product]).get(product.index, [])
+        return self._download_product(product, dl_opt, dir, if_exists)
+    
+    def _download_product(
+        self, 
+        product: SandProduct, 
+        dl_opt: list[dict], 
+        dir: Path | str, 
+        if_exists: Literal['skip','overwrite','backup','error'] = "skip"
+    ) -> Path:
+        """
+        Download a product from its download options
+        """
+        target = Path(dir)/(product.product_id)    
+        url, ext = self._resolve_download_url(dl_opt)
+        filegen(0, if_exists=if_exists)(self._download)(target, url, ext)
+        log.info(f'Product has been downloaded at : {target}')
+        return target
+    
+    def _resolve_download_url(self, dl_opt: list[dict]) -> tuple[str, str|None]:
+        """
+        Request the download url of the first downloadable option of a product
+        """
         # Find available acquisitions
-        for prod in dl_opt.json()['data']:
+        for prod in dl_opt:
             
             # Check if product is correct
             if not self._check_product(prod): 
@@ -263,22 +327,79 @@ class DownloadUSGS(BaseDownload):
             
             # It is required to wrap it with a try as some products have an inaccurate description 
             try:
-                url, ext = self._get_dl_url(prod)
+                return self._get_dl_url(prod)
             except ValueError as e:
                 if 'The selected product is not a downloadable product' in str(e):
                     continue
                 else:
                     raise e
-                
-            filegen(0, if_exists=if_exists)(self._download)(target, url, ext)
-            log.info(f'Product has been downloaded at : {target}')
-            return target
         
         msg = 'No product immediately available.'
-        if len(dl_opt.json()['data']):
+        if len(dl_opt):
             msg += ' Your product is likely to be archived.'
         raise ReferenceError(msg)
     
+    def download_all(
+        self, 
+        products, 
+        dir: Path|str, 
+        if_exists: Literal['skip','overwrite','backup','error'] = "skip",
+        parallelized: bool|None = None,
+        *,
+        max_workers: int = 1,
+        return_exceptions: bool = False,
+        executor: Executor|None = None
+    ) -> list[Path|Exception]:
+        """
+        Download all products resulting from a query. Download options of 
+        every product are requested at once and, with several workers, each 
+        archive is extracted by the worker which downloaded it while the other 
+        workers keep downloading.
+
+        Args:
+            products (list[SandProduct]): Products from query results
+            dir (Path|str): Directory where to save downloaded products
+            if_exists (str, optional): Action to take if product exists
+            parallelized (bool, optional): Deprecated, use max_workers instead.
+            max_workers (int, optional): Number of simultaneous downloads, keep
+                it low to respect the rate limits of USGS. Default is 1.
+            return_exceptions (bool, optional): If True, a failed download does 
+                not stop the others and its exception is returned in place of 
+                the path of the product. Otherwise the first error is raised.
+            executor (Executor, optional): Pool to submit downloads to instead 
+                of creating a new one, it is not shut down afterwards.
+
+        Returns:
+            list[Path|Exception]: List of paths to downloaded products
+        """
+        max_workers = _parallelized_workers(parallelized, max_workers)
+        products = list(products)
+        out = [None]*len(products)
+        
+        # Products already downloaded are skipped before any request
+        todo = []
+        for i, p in enumerate(products):
+            target = Path(dir)/(p.product_id)
+            if if_exists == 'skip' and target.exists():
+                out[i] = target
+            else:
+                todo.append(i)
+        if not todo:
+            return out
+        
+        # Retrieve download options of every product at once
+        self._login()
+        dl_opt = self._get_dl_options([products[i] for i in todo])
+        
+        process = lambda p: self._download_product(p, dl_opt.get(p.index, []), 
+                                                   dir, if_exists)
+        results = self._map_threads(process, [products[i] for i in todo], 
+                                    max_workers, 'downloading', 
+                                    return_exceptions, executor)
+        for i, res in zip(todo, results):
+            out[i] = res
+        return out
+    
     def _download(
         self,
         target: Path,
@@ -292,22 +413,17 @@ class DownloadUSGS(BaseDownload):
         # Compression file path
         dl_target = target.with_suffix(compression_ext) if compression_ext else target
         
-        # Initialize session for download
-        self.session.headers.update(self.API_key)
-
-        # Try to request server
-        niter = 0
-        response = self.session.get(url, allow_redirects=False)
+        # Request server, redirections are followed by the session
         log.debug(f'Requesting server for {target.name}')
-        while response.status_code in (301, 302, 303, 307) and niter < 5:
-            if 'Location' not in response.headers:
-                raise ValueError(f'status code : [{response.status_code}]')
-            url = response.headers['Location']
-            response = self.session.get(url, verify=True, allow_redirects=True)
-            niter += 1
+        response = self.session.get(url, allow_redirects=True, stream=True)
+        if response.status_code == 401:
+            self._relogin()
+            response = self.session.get(url, allow_redirects=True, stream=True)
+        raise_api_error(response)
 
-        # Download file
-        write(response, dl_target)
+        # Download file, the transfer is resumed if the connection drops
+        write(response, dl_target, session=self.session, 
+              segments=self.download_segments)
             
         # Uncompress archive
         if compression_ext:
@@ -326,13 +442,14 @@ class DownloadUSGS(BaseDownload):
         target = Path(dir)/(product.product_id + '.png')
 
         if not target.exists():
-            assets = self.metadata(product)['Landsat Product Identifier L1']
+            # Only one field is needed, stop at it rather than building all metadata
+            assets = next((m['value'] for m in product.metadata['metadata'] 
+                           if m['fieldName'] == 'Landsat Product Identifier L1'), None)
             log.check(assets, f'Skipping quicklook {target.name}', e=FileNotFoundError)
-            for b in product.metadata['browse']:
-                url = b['browsePath']
-                if 'type=refl' in url:
-                    filegen(0)(self._download)(target, url)
-                    break
+            url = next((b['browsePath'] for b in product.metadata['browse'] 
+                        if 'type=refl' in b['browsePath']), None)
+            log.check(url, f'No refl quicklook for {target.name}', e=FileNotFoundError)
+            filegen(0)(self._download)(target, url)
 
         log.info(f'Quicklook has been downloaded at : {target}')
         return target    
@@ -341,10 +458,7 @@ class DownloadUSGS(BaseDownload):
     def metadata(self, product):
         self._login()
         
-        meta = {}
-        for m in product.metadata['metadata']: 
-            meta[m['fieldName']] = m['value']
-        return meta
+        return {m['fieldName']: m['value'] for m in product.metadata['metadata']}
     
     def _get_entity_id(self, display_id: str, dataset: str|None = None) -> str:
         """
@@ -362,12 +476,16 @@ class DownloadUSGS(BaseDownload):
         Raises:
             Exception: If conversion fails or product not found
         """
+        # Display IDs never change of entity ID, convert each of them only once
+        if (display_id, dataset) in self._entity_ids:
+            return self._entity_ids[(display_id, dataset)]
+        
         self._login()
         
         # Use scene-list-add and scene-list-get to convert display ID to entity ID
         # This is the recommended approach since the lookup endpoint was deprecated
         
-        list_id = "".join(choice(ascii_lowercase) for i in range(10))
+        list_id = token_hex(8)
         
         try:
             # Add the display ID to a temporary scene list
@@ -378,7 +496,6 @@ class DownloadUSGS(BaseDownload):
                 "idField": "displayId",
                 "entityId": display_id,
             }
-            self.session.headers.update(self.API_key)
             response = self.session.get(url, json=params)
             raise_api_error(response)
             
@@ -388,12 +505,13 @@ class DownloadUSGS(BaseDownload):
             response = self.session.get(url, json=params)
             raise_api_error(response)
             
-            scenes = response.json().get('data', [])
+            scenes = load_json(response.content).get('data', [])
             if not scenes:
                 raise Exception(f"No entity ID found for display ID: {display_id}")
             
             entity_id = scenes[0]['entityId']
             log.debug(f"Converted {display_id} → {entity_id}")
+            self._entity_ids[(display_id, dataset)] = entity_id
             return entity_id
             
         finally:
@@ -406,29 +524,53 @@ class DownloadUSGS(BaseDownload):
                 pass  # Ignore cleanup errors
         
         
-    def _check_product(self, product) -> bool:
-        # Check if product is available
-        available = product['available']
+    def _get_scene_identifier_filter_id(self, dataset: str) -> str|None:
+        """
+        Return the ID of the 'Scene Identifier' metadata filter of a dataset, 
+        requested once per dataset
+        """
+        if dataset in self._filter_ids:
+            return self._filter_ids[dataset]
         
-        # Check if product is a bundle 
-        is_bundle = 'Bundle' in product['productName'] 
-        is_bundle |= len(product['secondaryDownloads']) > 1      
+        url = 'https://m2m.cr.usgs.gov/api/api/json/stable/dataset-filters'
+        r = self.session.get(url, json={'datasetName': dataset})
+        raise_api_error(r)
         
-        # Only download folder or compressed archive
-        is_folder = product['downloadSystem'] in ['ls_zip','folder']
+        filterid = None
+        for dfilter in load_json(r.content)['data']:
+            if 'Scene Identifier' in dfilter['fieldLabel']:
+                filterid = dfilter['id']
+                break
         
-        return is_folder & is_bundle & available 
+        self._filter_ids[dataset] = filterid
+        return filterid
     
-    def _get_dl_options(self, product: SandProduct):
-        
-        # Find product in dataset
+    def _check_product(self, product) -> bool:
+        # Product must be available, then only download folder or compressed 
+        # archive, then check if product is a bundle
+        return (
+            product['available']
+            and product['downloadSystem'] in ('ls_zip', 'folder')
+            and ('Bundle' in product['productName'] 
+                 or len(product['secondaryDownloads']) > 1)
+        )
+    
+    def _get_dl_options(self, products: list[SandProduct]) -> dict[str, list[dict]]:
+        """
+        Request download options of several products at once, grouped by entity ID
+        """
+        # Find products in dataset
         url = "https://m2m.cr.usgs.gov/api/api/json/stable/download-options"
-        params = {'entityIds': product.index, "datasetName": self.api_collection}
+        params = {'entityIds': [p.index for p in products], 
+                  "datasetName": self.api_collection}
         params.update(includeSecondaryFileGroups=True)
-        self.session.headers.update(self.API_key)
         dl_opt = self.session.get(url, json=params)
         raise_api_error(dl_opt)
-        return dl_opt        
+        
+        out = {}
+        for opt in load_json(dl_opt.content)['data'] or []:
+            out.setdefault(opt['entityId'], []).append(opt)
+        return out
     
     
     def _get_dl_url(self, product) -> tuple[str]:
@@ -438,11 +580,13 @@ class DownloadUSGS(BaseDownload):
                     
         # Find one available product     
         url = "https://m2m.cr.usgs.gov/api/api/json/stable/download-request"
-        label = datetime.now().strftime("%Y%m%d_%H%M%S") # Customized label using date time
         downloads = [{'entityId':product['entityId'], 'productId':product['id']}]
-        params = {'label': label, 'downloads' : downloads}
+        params = {'label': self._dl_label, 'downloads' : downloads}
         dl = self.session.get(url, json=params)
-        dl = dl.json()['data']
+        if dl.status_code == 401:
+            self._relogin()
+            dl = self.session.get(url, json=params)
+        dl = load_json(dl.content)['data']
         
         # Collect url for download
         if dl['numInvalidScenes'] != 0: 
@@ -452,4 +596,25 @@ class DownloadUSGS(BaseDownload):
             raise ValueError(msg)
         
         url = dl['availableDownloads'][0]['url']
-        return url, ext
\ No newline at end of file
+        return url, ext
+
+
+@lru_cache(maxsize=4)
+def _cached_auth(host: str) -> dict:
+    """
+    Read credentials of a host once per process
+    """
+    return get_auth(host)
+
+def _is_accepted(content: bytes) -> bool:
+    """
+    Check if a M2M response body holds data rather than an error
+    """
+    content = load_json(content)
+    return content.get('errorCode') is None and content.get('data') is not None
+
+def _is_global(bounds) -> bool:
+    """
+    Check if (lat_min, lon_min, lat_max, lon_max) bounds cover the whole globe
+    """
+    return bounds[0] <= -90 and bounds[2] >= 90 and bounds[3] - bounds[1] >= 360
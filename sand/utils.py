@@ -1,10 +1,28 @@
 from datetime import timedelta, datetime
-from shapely.ops import transform
-from re import search, fullmatch
+from shapely import transform
+from re import search, compile
+from functools import lru_cache, partial
+from typing import Callable
 # from hashlib import blake2b
 from pathlib import Path
-from numpy import log2
 from core import log
+from queue import Queue
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from errno import ENOSPC
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+import os
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+try:
+    from ijson import items as _iter_items, parse as _parse_events
+except ImportError:
+    _iter_items = _parse_events = None
 
 
 def check_name_contains(name: str, elements: list[str]) -> bool:
@@ -20,44 +38,38 @@ def check_name_contains(name: str, elements: list[str]) -> bool:
     """
     return all(e in name for e in elements)
 
-def check_name_startswith(name: str, prefix: str) -> bool:
-    """
-    Check if a name starts with the given prefix
-    
-    Args:
-        name (str): The name to check
-        prefix (str): The prefix to look for
-        
-    Returns:
-        bool: True if name starts with prefix, False otherwise
-    """
-    return name.startswith(prefix)
-
-def check_name_endswith(name: str, suffix: str) -> bool:
+def check_name_glob(name: str, regexp: str) -> bool:
     """
-    Check if a name ends with the given suffix
+    Check if a name matches a regular expression pattern
     
     Args:
         name (str): The name to check
-        suffix (str): The suffix to look for
+        regexp (str): Regular expression pattern to match against
         
     Returns:
-        bool: True if name ends with suffix, False otherwise
+        bool: True if name matches the pattern exactly, False otherwise
     """
-    return name.endswith(suffix)
+    return make_glob_checker(regexp)(name)
 
-def check_name_glob(name: str, regexp: str) -> bool:
+@lru_cache(maxsize=64)
+def make_glob_checker(regexp: str) -> Callable[[str], bool]:
     """
-    Check if a name matches a regular expression pattern
+    Build a predicate checking if a name fully matches a regular expression.
+    The match-all pattern '.*' is skipped and a pattern without any special 
+    character is compared as a plain string, otherwise it is compiled once.
     
     Args:
-        name (str): The name to check
         regexp (str): Regular expression pattern to match against
         
     Returns:
-        bool: True if name matches the pattern exactly, False otherwise
+        Callable[[str], bool]: Predicate on product names
     """
-    return bool(fullmatch(regexp, name))
+    if regexp == '.*':
+        return lambda name: True
+    if not search(r'[.^$*+?{}\[\]|()\\]', regexp):
+        return regexp.__eq__
+    fullmatch = compile(regexp).fullmatch
+    return lambda name: fullmatch(name) is not None
 
 def end_of_day(date: datetime) -> datetime:
     """
@@ -75,6 +87,18 @@ def end_of_day(date: datetime) -> datetime:
         return date
     return date
 
+def isoformat_seconds(date: datetime) -> str:
+    """
+    Format a datetime as an ISO 8601 string truncated to seconds
+    
+    Args:
+        date (datetime): The datetime object to format
+        
+    Returns:
+        str: 'YYYY-MM-DDTHH:MM:SS' string, without microseconds nor UTC offset
+    """
+    return date.replace(tzinfo=None).isoformat(timespec='seconds')
+
 def flip_coords(geo):
     """
     Flip x and y coordinates in a geometry
@@ -88,14 +112,192 @@ def flip_coords(geo):
     Note:
         Useful for converting between (x,y) and (lat,lon) coordinate orders
     """
-    return transform(lambda x,y: (y,x), geom=geo)
+    return transform(geo, lambda coords: coords[:, ::-1])
 
-def write(response, filepath):
+def write(response, filepath, chunk_size: int = 1 << 20, 
+          write_behind: int = 256 << 20, session=None, segments: int = 1):
+    """
+    Write the content of a response to a file, chunk by chunk as it is received.
+    The request should be sent with ``stream=True`` so that the whole content
+    is never held in memory.
+    
+    Args:
+        response (requests.Response): Response to write
+        filepath (Path): Destination file
+        chunk_size (int): Size in bytes of the chunks read from the response
+        write_behind (int): Size in bytes above which chunks are written by a 
+            separate thread, so that disk writes overlap with network reads
+        session (requests.Session, optional): Session used to request the 
+            remaining bytes if the connection drops, when the server accepts 
+            range requests
+        segments (int): Number of byte ranges of a file larger than write_behind
+            requested in parallel through the session, when the server accepts 
+            range requests
+    """
     log.debug('Start writing on device')
-    chunk = 2 ** round(log2(len(response.content)/100))
-    pbar = log.pbar(list(response.iter_content(chunk_size=chunk)), 'writing')
+    size = int(response.headers.get('Content-Length', 0))
+    
+    # Body already loaded in memory, the request was sent without stream=True
+    if response._content_consumed:
+        with open(filepath, 'wb') as f:
+            f.write(response.content)
+        return
+    
+    # Large files are split in byte ranges downloaded over several connections
+    resumable = session is not None and _accepts_ranges(response)
+    if resumable and segments > 1 and size >= write_behind and hasattr(os, 'pwrite'):
+        return _write_segments(session, response, filepath, size, segments, chunk_size)
+    
+    # Resumable downloads read the body through a reader requesting the 
+    # remaining bytes when the connection drops
+    if resumable:
+        raw = _ResumableReader(session, response)
+    else:
+        raw = response.raw
+        raw.decode_content = True
+    chunks = log.pbar(iter(partial(raw.read, chunk_size), b''), 'writing')
+    
+    # Decoded size of compressed bodies is unknown, nothing is reserved
+    reserve = 0 if 'Content-Encoding' in response.headers else size
+    
+    if size >= write_behind:
+        return _write_behind(chunks, filepath, reserve)
+    
+    with open(filepath, 'wb') as f:
+        _preallocate(f, reserve)
+        for chunk in chunks:
+            f.write(chunk)
+
+def _preallocate(f, size: int):
+    """
+    Reserve the disk space of a file before writing it, so that it is allocated
+    contiguously and a full disk is detected before downloading
+    """
+    if not size or not hasattr(os, 'posix_fallocate'):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError as e:
+        # Some filesystems do not support it, only a full disk is an error
+        if e.errno == ENOSPC: raise
+
+def _accepts_ranges(response) -> bool:
+    """
+    Check if the remaining bytes of a response can be requested with a Range 
+    header, which requires the body to be sent without content encoding
+    """
+    return (response.headers.get('Accept-Ranges') == 'bytes' 
+            and 'Content-Encoding' not in response.headers)
+
+def _write_segments(session, response, filepath, size: int, segments: int, 
+                    chunk_size: int):
+    """
+    Download a body as several byte ranges requested in parallel, each of them
+    written at its offset in the file. The first range is read from the 
+    response itself.
+    """
+    bounds = [size * i // segments for i in range(segments + 1)]
+    
+    def _segment(i: int):
+        start, end = bounds[i], bounds[i+1]
+        if i == 0:
+            resp = response
+        else:
+            headers = {'Range': f'bytes={start}-{end-1}', 'Accept-Encoding': 'identity'}
+            resp = session.get(response.url, headers=headers, stream=True)
+            if resp.status_code != 206:
+                resp.close()
+                raise ConnectionError(f'Range request failed, server replied '
+                                      f'[{resp.status_code}]')
+        reader = _ResumableReader(session, resp, start=start, end=end)
+        try:
+            offset = start
+            for data in iter(partial(reader.read, chunk_size), b''):
+                os.pwrite(fd, data, offset)
+                offset += len(data)
+        finally:
+            reader.response.close()
+    
     with open(filepath, 'wb') as f:
-        [f.write(chunk) for chunk in pbar if chunk]
+        _preallocate(f, size)
+        fd = f.fileno()
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            list(log.pbar(pool.map(_segment, range(segments)), 'writing'))
+
+class _ResumableReader:
+    """
+    Binary file object reading the body of a response, the remaining bytes are
+    requested from the same url with a Range header when the connection drops
+    before the end. Only the bytes from start to end of the file are read.
+    """
+    def __init__(self, session, response, attempts: int = 3, 
+                 start: int = 0, end: int|None = None):
+        self.session, self.response, self.attempts = session, response, attempts
+        self.start, self.end = start, end
+        self.received = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        if self.end is not None:
+            remaining = self.end - self.start - self.received
+            size = remaining if size < 0 else min(size, remaining)
+            if size == 0: return b''
+        while True:
+            try:
+                data = self.response.raw.read(size)
+                self.received += len(data)
+                return data
+            except (ProtocolError, ReadTimeoutError) as e:
+                if self.attempts == 0: raise
+                self.attempts -= 1
+                self._resume(e)
+    
+    def _resume(self, error: Exception):
+        log.warning(f'Connection lost after {self.received} bytes, '
+                    f'resume download ({error})')
+        stop = '' if self.end is None else self.end - 1
+        headers = {'Range': f'bytes={self.start + self.received}-{stop}', 
+                   'Accept-Encoding': 'identity'}
+        url = self.response.url
+        self.response.close()
+        self.response = self.session.get(url, headers=headers, stream=True)
+        if self.response.status_code != 206:
+            self.response.close()
+            raise ConnectionError(
+                f'Download cannot be resumed, server replied '
+                f'[{self.response.status_code}]'
+            ) from error
+
+def _write_behind(chunks, filepath, size: int = 0, depth: int = 8):
+    """
+    Write chunks to a file from a separate thread, at most depth chunks are
+    waiting in memory to be written. The disk space of size bytes is reserved 
+    before writing.
+    """
+    queue = Queue(maxsize=depth)
+    error = []
+    
+    def _writer():
+        try:
+            with open(filepath, 'wb') as f:
+                _preallocate(f, size)
+                for chunk in iter(queue.get, None):
+                    f.write(chunk)
+        except Exception as e:
+            error.append(e)
+            # Unblock the reader until it notices the failure
+            while queue.get() is not None: pass
+    
+    thread = Thread(target=_writer, daemon=True)
+    thread.start()
+    try:
+        for chunk in chunks:
+            if error: break
+            if chunk: queue.put(chunk)
+    finally:
+        queue.put(None)
+        thread.join()
+    if error:
+        raise error[0]
 
 def get_compression_suffix(filename):
     possible = ['zip','tgz','tar','tar.gz','gz','bz2','Z','rar']
@@ -104,6 +306,68 @@ def get_compression_suffix(filename):
     else:
         return None
 
+def load_json(content: bytes|str):
+    """
+    Decode a JSON document, using orjson when it is installed
+    
+    Args:
+        content (bytes|str): Raw JSON document, typically a response content
+        
+    Returns:
+        Decoded python object
+    """
+    return _loads(content)
+
+def iter_json_items(fp, key: str, header: dict|None = None):
+    """
+    Iterate over the elements of a JSON array. With ijson installed, elements 
+    are parsed one at a time as they are read from the file object, otherwise
+    the whole document is decoded first. Nothing is yielded if the array is null.
+    
+    Args:
+        fp: Binary file object containing the JSON document (e.g. a raw response)
+        key (str): Path of the array in the document, with nested keys 
+            separated by dots (e.g. 'data.results')
+        header (dict, optional): Filled with the top-level values of the 
+            document which are not objects nor arrays (e.g. error codes), a 
+            null value is stored as None. Complete once iteration is over.
+    """
+    if _iter_items is None:
+        content = load_json(fp.read())
+        if header is not None:
+            header.update({k: v for k, v in content.items() 
+                           if not isinstance(v, dict|list)})
+        for k in key.split('.'):
+            content = content[k] if content else None
+        yield from content or []
+    elif header is None:
+        yield from _iter_items(fp, f'{key}.item', use_float=True)
+    else:
+        yield from _iter_items(_header_events(fp, header), f'{key}.item')
+
+def _header_events(fp, header: dict):
+    """
+    Forward the parsing events of a JSON document, storing top-level scalars
+    """
+    for prefix, event, value in _parse_events(fp, use_float=True):
+        if prefix and '.' not in prefix and event in ('string', 'number', 
+                                                       'boolean', 'null'):
+            header[prefix] = value
+        yield prefix, event, value
+
+def write_atomic(filepath: Path, content: bytes) -> None:
+    """
+    Write content to a file so that readers never see a partially written file
+    
+    Args:
+        filepath (Path): Destination file
+        content (bytes): Data to write
+    """
+    tmp = filepath.with_name(f'.{filepath.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, filepath)
+
 def drop_extension(filename: str) -> str:
     possible_extensions = ['.nc','.h5']
     for ext in possible_extensions:
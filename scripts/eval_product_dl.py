@@ -50,7 +50,7 @@ with TemporaryDirectory() as tmpdir:
             if collec not in products: 
                 continue
             
-            params = products[collec]['constraint']
+            params = products[collec].constraint
             for level in [1,2,3]:
                 
                 msg_start = f'Download of {collec} {level} with provider {name}'
@@ -31,10 +31,10 @@ def get_tempdir(keep):
 
 with get_tempdir(args.keep) as tmpdir:
     # d = dl[args.dl]()
-    # params = products[args.sensor]['constraint']
+    # params = products[args.sensor].constraint
     # params.update(collection_sand=args.sensor, level=int(args.level))
     d = import_module(dl['USGS'])()
-    params = products['LANDSAT-9-OLI']['constraint']
+    params = products['LANDSAT-9-OLI'].constraint
     params.update(collection_sand='LANDSAT-9-OLI', level=1)
     ls = d.query(**params)
     d.download(ls[0], tmpdir)
@@ -16,10 +16,10 @@ def collec(request): return request.param
 def level(request): return request.param
     
 @pytest.fixture
-def constraint(collec): return products[collec]['constraint']
+def constraint(collec): return products[collec].constraint
 
 @pytest.fixture
-def product_id(): return products['SENTINEL-1-SAR']['l1_product']
+def product_id(): return products['SENTINEL-1-SAR'].l1_product
 
 
 def test_login(downloader):
@@ -43,7 +43,7 @@ def test_download_file(downloader, product_id):
 def test_venus_download_file():
     with TemporaryDirectory() as tmpdir:
         dl = DownloadCNES()
-        prod_id = products['VENUS']['l1_product']
+        prod_id = products['VENUS'].l1_product
         out = dl.download_file(prod_id, tmpdir)
         assert out.exists()
         assert out.name.startswith(prod_id)
\ No newline at end of file
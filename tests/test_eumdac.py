@@ -19,10 +19,10 @@ def level(request):
 
 @pytest.fixture
 def constraint(collec):
-    return products[collec]['constraint']
+    return products[collec].constraint
 
 @pytest.fixture
-def product_id(collec): return products[collec]['l1_product']
+def product_id(collec): return products[collec].l1_product
 
 
 def test_login(downloader):
@@ -10,5 +10,5 @@ def test_download_all():
     with TemporaryDirectory() as tmpdir, Chrono():
         sensor = 'SENTINEL-3-OLCI-FR' 
         dl = DownloadEumDAC(sensor)
-        ls = dl.query(**products[sensor]['level1'])
-        dl.download_all(ls.iloc[:4], tmpdir, parallelized=True)
+        ls = dl.query(**products[sensor].constraint)
+        dl.download_all(ls[:4], tmpdir, max_workers=4)
@@ -5,10 +5,10 @@ from core.geo.product_name import get_pattern, retrieve_product
 
 
 list_prod = []
-for name, dico in products.items():
-    for level, params in dico.items():
-        if 'product_id' in params:
-            list_prod.append((name, params['product_id']))
+for name, sample in products.items():
+    for product_id in (sample.l1_product, sample.l2_product):
+        if product_id:
+            list_prod.append((name, product_id))
 
 @pytest.fixture(params=list_prod)
 def product(request): return request.param
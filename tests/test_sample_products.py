@@ -1,4 +1,5 @@
-from sand.sample_product import products
+from sand.sample_product import products, query_intersects
+from sand.constraint import Geo
 from core.table import read_csv
 from pathlib import Path
 
@@ -8,4 +9,9 @@ def test_product_collection_name():
     sensors = read_csv(ref_file)['Name'].values
     collecs = list(products)
     difference = set(sensors).difference(collecs).intersection(collecs)
-    assert len(difference) == 0, f'Following collections in sample product are wrong: {difference}'
\ No newline at end of file
+    assert len(difference) == 0, f'Following collections in sample product are wrong: {difference}'
+
+def test_query_intersects():
+    area = Geo.Polygon(latmin=44, latmax=46, lonmin=6, lonmax=8)
+    assert set(query_intersects(area)) == {'SENTINEL-2-MSI', 'SENTINEL-3-SRAL'}
+    assert query_intersects(Geo.Point(lat=-60, lon=-150)) == []
@@ -1,10 +1,13 @@
 from sand.copernicus_dataspace import DownloadCDSE
 from sand.sample_product import products
-from sand.constraint import _change_lon_convention
+from sand.constraint import Name, _change_lon_convention
+from sand.base import raise_api_error, RequestsError, BaseDownload
+from sand.results import SandProduct
 
 from core.table import read_csv
 from shapely import Point, Polygon
 from pathlib import Path
+from requests import Response
 
 import pytest
 
@@ -15,7 +18,7 @@ def collec(request):
 
 @pytest.fixture
 def constraint(collec):
-    return products[collec]['constraint']
+    return products[collec].constraint
 
 def test_invalid_level(collec):
     with pytest.raises(ReferenceError):
@@ -28,4 +31,52 @@ def test_latlon_change_convention(center, value):
 @pytest.mark.parametrize('provider', ['cdse','eumdac','nasa','cnes','usgs'])
 def test_provider_file(provider):
     p = str(Path(__file__).parent.parent/'sand'/'collections'/'{}.csv')
-    read_csv(p.format(provider))
\ No newline at end of file
+    read_csv(p.format(provider))
+
+@pytest.mark.parametrize('name, expected', [
+    ('S2A_MSIL1C_20230617T130251_N0510_R095_T23KPQ', True),
+    ('S2B_MSIL1C_20230617T130251_N0510_R095_T23KPQ', False),
+    ('S2A_MSIL2A_20230617T130251_N0510_R095_T23KPQ', False),
+    ('S2A_MSIL1C_20230617T130251_N0510_R095_T31TFJ', False),
+])
+def test_name_matcher(name, expected):
+    constraint = Name(contains=['MSIL1C'], startswith='S2A', endswith='KPQ', glob='.*_N0510_.*')
+    assert constraint.matcher()(name) == expected
+    assert constraint.apply(name) == expected
+
+def test_name_matcher_tuple():
+    match = Name(startswith=('S2A', 'S2B'), endswith=('KPQ', 'TFJ')).matcher()
+    assert match('S2B_MSIL1C_20230617T130251_N0510_R095_T31TFJ')
+    assert not match('S2C_MSIL1C_20230617T130251_N0510_R095_T31TFJ')
+
+def test_name_matcher_escape():
+    match = Name(contains=['.SAFE', 'L1C'], startswith='S2').matcher()
+    assert match('S2A_MSIL1C_20230617T130251_N0510_R095_T31TFJ.SAFE')
+    assert not match('S2A_MSIL1C_20230617T130251_N0510_R095_T31TFJxSAFE')
+
+@pytest.mark.parametrize('status', [404, 599])
+def test_raise_api_error(status):
+    response = Response()
+    response.status_code = status
+    with pytest.raises(RequestsError):
+        raise_api_error(response)
+
+class _FailingDownload(BaseDownload):
+    def _login(self): 
+        pass
+    def download(self, product, dir, if_exists='skip'):
+        if product.product_id == 'bad': 
+            raise ValueError(product.product_id)
+        return Path(dir)/product.product_id
+
+@pytest.mark.parametrize('args, kwargs', [
+    ((), {}), ((), {'max_workers': 2}), (('skip', True), {})
+])
+def test_download_all_failure(args, kwargs):
+    products = [SandProduct('ok', '2020-01-01', {}), SandProduct('bad', '2020-01-01', {})]
+    with pytest.raises(ValueError):
+        _FailingDownload().download_all(products, 'dir', *args, **kwargs)
+    out = _FailingDownload().download_all(products, 'dir', *args, **kwargs, 
+                                          return_exceptions=True)
+    assert out[0] == Path('dir')/'ok'
+    assert isinstance(out[1], ValueError)